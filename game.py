@@ -1,7 +1,15 @@
 import pygame
 import random
 import sys
+import os
+import csv
+import time
+import json
+import uuid
+import shutil
+from array import array
 from enum import Enum
+from contextlib import contextmanager
 from collections import deque
 
 # Initialize pygame
@@ -15,6 +23,13 @@ GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
 FPS = 10
 
+# Match log settings
+LOG_DIR = "match_logs"
+LOG_BATCH_SIZE = 256  # Events buffered in memory before hitting the disk
+LOG_STALE_SECONDS = 3600  # Logs untouched this long were left behind by a crashed game
+LOG_SEGMENT_ROWS = 1000000  # compact_logs merges small segments until they reach this many rows
+LOCK_STALE_SECONDS = 30  # A manifest lock held this long belongs to a crashed process
+
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -35,6 +50,303 @@ class Direction(Enum):
     LEFT = (-1, 0)
     RIGHT = (1, 0)
 
+# Match events
+class EventType(Enum):
+    TICK = 0
+    EAT = 1
+    DEATH = 2
+    RESPAWN = 3
+    COLLISION = 4
+
+class Actor(Enum):
+    PLAYER = 0
+    ENEMY = 1
+
+class Cause(Enum):
+    NONE = 0
+    WALL = 1
+    SELF = 2
+    PLAYER = 3
+    ENEMY = 4
+
+class EventBus:
+    # Game code emits here without knowing who listens, the match log is just one subscriber
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def emit(self, tick, event, actor=Actor.PLAYER, cause=Cause.NONE, player_score=0, enemy_score=0):
+        for callback in self.subscribers:
+            callback(tick, event, actor, cause, player_score, enemy_score)
+
+class MatchLog:
+    # Every event is one row of plain ints so both the log and the columns stay cheap
+    COLUMNS = ("match", "tick", "event", "actor", "cause", "player_score", "enemy_score")
+
+    def __init__(self, log_dir=LOG_DIR, batch_size=LOG_BATCH_SIZE):
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        # Random 63-bit id, so games started in the same millisecond never share one
+        self.match_id = uuid.uuid4().int >> 65
+        # Every game writes its own log, so compaction never races another writer
+        self.log_path = os.path.join(log_dir, f"events-{self.match_id}.csv")
+        self.buffer = []
+        self.tail_checked = False
+
+    def record(self, tick, event, actor, cause, player_score, enemy_score):
+        # Tick path only appends a tuple, the disk is touched once per batch
+        self.buffer.append((self.match_id, tick, event.value, actor.value, cause.value,
+                            player_score, enemy_score))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch = self.buffer
+        self.buffer = []
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            if not self.tail_checked:
+                self.end_torn_line()
+                self.tail_checked = True
+            with open(self.log_path, "a", newline="") as f:
+                csv.writer(f).writerows(batch)
+        except OSError:
+            pass  # The log is only analytics, a full or read-only disk must not stop the game
+
+    def close(self):
+        # Only this match's log is compacted here, other games' leftovers are compact_logs' job
+        self.flush()
+        try:
+            if os.path.exists(self.log_path):
+                pending = claim_log(self.log_path)
+                if pending:
+                    compact_pending(self.log_dir, pending)
+        except (OSError, ValueError):
+            pass  # Whatever is left on disk gets picked up by compact_logs
+
+    def end_torn_line(self):
+        # A crash can leave the last row without its newline, don't glue the next batch onto it
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+def claim_log(path):
+    # Rename the log to a private name so nobody appends to it while it is compacted
+    pending = f"{path[:-len('.csv')]}-{time.time_ns()}.pending"
+    try:
+        os.replace(path, pending)
+    except FileNotFoundError:
+        return None  # Another process claimed it first
+    return pending
+
+def read_rows(path):
+    columns = {name: array("q") for name in MatchLog.COLUMNS}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) != len(MatchLog.COLUMNS):
+                continue  # Partial line from an interrupted write
+            try:
+                values = [int(value) for value in row]
+            except ValueError:
+                continue
+            for name, value in zip(MatchLog.COLUMNS, values):
+                columns[name].append(value)
+    return columns
+
+def read_manifest(columns_dir):
+    # The manifest lists every finished segment and its row count, queries never walk the directory
+    try:
+        with open(os.path.join(columns_dir, "manifest.json")) as f:
+            return json.load(f)["segments"]
+    except FileNotFoundError:
+        return []
+
+def write_manifest(columns_dir, segments):
+    path = os.path.join(columns_dir, "manifest.json")
+    temp = f"{path}.tmp-{os.getpid()}"
+    with open(temp, "w") as f:
+        json.dump({"segments": segments}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+@contextmanager
+def manifest_lock(columns_dir):
+    # mkdir is atomic on every platform, so a directory works as a cross-process lock
+    lock = os.path.join(columns_dir, ".manifest.lock")
+    while True:
+        try:
+            os.mkdir(lock)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > LOCK_STALE_SECONDS:
+                    os.rmdir(lock)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.rmdir(lock)
+
+def write_segment(columns_dir, name, write_column):
+    # A segment is built in a hidden directory and only appears once every column is on disk
+    segment = os.path.join(columns_dir, name)
+    temp = os.path.join(columns_dir, f".tmp-{os.getpid()}-{name}")
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    for column_name in MatchLog.COLUMNS:
+        with open(os.path.join(temp, column_name + ".bin"), "wb") as f:
+            write_column(column_name, f)
+            f.flush()
+            os.fsync(f.fileno())
+    try:
+        os.replace(temp, segment)
+    except OSError:
+        shutil.rmtree(temp, ignore_errors=True)
+        if not os.path.isdir(segment):
+            raise
+
+def compact_pending(log_dir, pending):
+    # The segment is named after its log and the log is only removed once the manifest lists it,
+    # so an interrupted compaction is simply redone later without duplicating rows
+    columns_dir = os.path.join(log_dir, "columns")
+    name = os.path.basename(pending)[:-len(".pending")]
+    segment = os.path.join(columns_dir, name)
+    os.makedirs(columns_dir, exist_ok=True)
+    if not os.path.isdir(segment):
+        try:
+            columns = read_rows(pending)
+        except FileNotFoundError:
+            return  # Another process already compacted it
+        if len(columns["match"]):
+            write_segment(columns_dir, name, lambda column_name, f: columns[column_name].tofile(f))
+    if os.path.isdir(segment):
+        rows = os.path.getsize(os.path.join(segment, "match.bin")) // 8
+        with manifest_lock(columns_dir):
+            segments = read_manifest(columns_dir)
+            if name not in {listed["name"] for listed in segments}:
+                write_manifest(columns_dir, segments + [{"name": name, "rows": rows}])
+    try:
+        os.remove(pending)
+    except FileNotFoundError:
+        pass
+
+def merge_segments(log_dir, segment_rows=LOG_SEGMENT_ROWS):
+    # Roll small segments into bigger ones so a query opens a few large files, not one per match
+    columns_dir = os.path.join(log_dir, "columns")
+    groups = [[]]
+    for segment in read_manifest(columns_dir):
+        if segment["rows"] >= segment_rows:
+            continue
+        if os.path.exists(os.path.join(log_dir, segment["name"] + ".pending")):
+            continue  # Its log may still re-add it, leave it until that finishes
+        if groups[-1] and sum(listed["rows"] for listed in groups[-1]) + segment["rows"] > segment_rows:
+            groups.append([])
+        groups[-1].append(segment)
+
+    for group in groups:
+        if len(group) < 2:
+            continue
+        name = f"merged-{time.time_ns()}-{os.getpid()}"
+
+        def write_column(column_name, f):
+            for listed in group:
+                with open(os.path.join(columns_dir, listed["name"], column_name + ".bin"), "rb") as source:
+                    shutil.copyfileobj(source, f)
+
+        write_segment(columns_dir, name, write_column)
+        merged = {listed["name"] for listed in group}
+        with manifest_lock(columns_dir):
+            segments = read_manifest(columns_dir)
+            swapped = merged <= {listed["name"] for listed in segments}
+            if swapped:
+                kept = [listed for listed in segments if listed["name"] not in merged]
+                write_manifest(columns_dir, kept + [{"name": name, "rows": sum(listed["rows"] for listed in group)}])
+        if swapped:
+            for old in merged:
+                shutil.rmtree(os.path.join(columns_dir, old), ignore_errors=True)
+        else:
+            # Another compactor merged some of these first
+            shutil.rmtree(os.path.join(columns_dir, name), ignore_errors=True)
+
+def remove_orphans(log_dir):
+    # Segments the manifest doesn't list are leftovers of an interrupted compaction or merge
+    columns_dir = os.path.join(log_dir, "columns")
+    if not os.path.isdir(columns_dir):
+        return
+    listed = {segment["name"] for segment in read_manifest(columns_dir)}
+    now = time.time()
+    for name in os.listdir(columns_dir):
+        path = os.path.join(columns_dir, name)
+        if name in listed or name == ".manifest.lock" or not os.path.isdir(path):
+            continue
+        if os.path.exists(os.path.join(log_dir, name + ".pending")):
+            continue  # Still waiting to be added to the manifest
+        if now - os.path.getmtime(path) > LOG_STALE_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+
+def compact_logs(log_dir=LOG_DIR, segment_rows=LOG_SEGMENT_ROWS):
+    # Offline housekeeping, run with: python game.py --compact
+    if not os.path.isdir(log_dir):
+        return
+    now = time.time()
+    for name in sorted(os.listdir(log_dir)):
+        path = os.path.join(log_dir, name)
+        if name.startswith("events-") and name.endswith(".csv"):
+            try:
+                stale = now - os.path.getmtime(path) > LOG_STALE_SECONDS
+            except FileNotFoundError:
+                continue
+            if not stale:
+                continue  # Still being written by a running game
+            path = claim_log(path)
+            if path is None:
+                continue
+        elif not name.endswith(".pending"):
+            continue
+        compact_pending(log_dir, path)
+    merge_segments(log_dir, segment_rows)
+    remove_orphans(log_dir)
+
+def read_column(columns_dir, segments, name):
+    # Only this column's file is opened in each segment
+    column = array("q")
+    for segment in segments:
+        part = array("q")
+        with open(os.path.join(columns_dir, segment["name"], name + ".bin"), "rb") as f:
+            part.frombytes(f.read())
+        if len(part) != segment["rows"]:
+            raise ValueError(f"Segment {segment['name']} has {len(part)} {name} values, expected {segment['rows']}")
+        column.extend(part)
+    return column
+
+def load_columns(names=MatchLog.COLUMNS, log_dir=LOG_DIR):
+    columns_dir = os.path.join(log_dir, "columns")
+    for attempt in range(3):
+        segments = read_manifest(columns_dir)
+        try:
+            return {name: read_column(columns_dir, segments, name) for name in names}
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+            # A merge replaced a segment while we were reading, start over from the new manifest
+
+def load_column(name, log_dir=LOG_DIR):
+    return load_columns((name,), log_dir)[name]
+
 # Create the screen
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Snake Game")
@@ -539,11 +851,9 @@ def game_loop(mode):
 
     wall_sprites = pygame.sprite.Group(walls)
 
-    running = True
-    game_over = False
-    player_score = 0
-    enemy_score = 0
-    game_started = False
+    events = EventBus()
+    match_log = MatchLog()
+    events.subscribe(match_log.record)
 
     # Show initial game screen
     screen.fill(BLACK)
@@ -551,6 +861,20 @@ def game_loop(mode):
     draw_text("Press any arrow key to start", 36, WHITE, SCREEN_WIDTH//2, SCREEN_HEIGHT//2)
     pygame.display.flip()
 
+    try:
+        run_match(mode, snake, enemy, food, walls, all_sprites, wall_sprites, events)
+    finally:
+        # Also runs on sys.exit() so the last batch is never lost
+        match_log.close()
+
+def run_match(mode, snake, enemy, food, walls, all_sprites, wall_sprites, events):
+    running = True
+    game_over = False
+    player_score = 0
+    enemy_score = 0
+    game_started = False
+    tick = 0
+
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -587,34 +911,47 @@ def game_loop(mode):
             if not game_started:
                 continue
 
+            tick += 1
+            events.emit(tick, EventType.TICK, player_score=player_score, enemy_score=enemy_score)
+
             # Update player snake if in play mode
             if mode == "play":
                 game_over = snake.update()
                 if game_over:
+                    events.emit(tick, EventType.DEATH, Actor.PLAYER, Cause.SELF, player_score, enemy_score)
                     show_game_over("enemy")
                     running = False
                     continue
 
             # Update enemy snake
+            enemy_was_alive = enemy.is_alive
             if mode == "play":
                 enemy.update(snake.head, walls)
             else:
                 enemy.update(None, walls)  # Just avoid walls in watch mode
+            if enemy.is_alive and not enemy_was_alive:
+                events.emit(tick, EventType.RESPAWN, Actor.ENEMY, Cause.NONE, player_score, enemy_score)
 
             # Check collisions with walls
             if pygame.sprite.spritecollide(snake.head, wall_sprites, False):
                 game_over = True
+                events.emit(tick, EventType.DEATH, Actor.PLAYER, Cause.WALL, player_score, enemy_score)
                 show_game_over("enemy")
                 running = False
                 continue
 
             if pygame.sprite.spritecollide(enemy.head, wall_sprites, False):
                 enemy_score += 1
+                # Dead enemies keep their head in place, so only log the first hit
+                if enemy.is_alive:
+                    events.emit(tick, EventType.DEATH, Actor.ENEMY, Cause.WALL, player_score, enemy_score)
                 enemy.die()
 
             # Check collisions between snakes
             if pygame.sprite.spritecollide(snake.head, enemy.enemy_sprites, False):
                 game_over = True
+                events.emit(tick, EventType.COLLISION, Actor.PLAYER, Cause.ENEMY, player_score, enemy_score)
+                events.emit(tick, EventType.DEATH, Actor.PLAYER, Cause.ENEMY, player_score, enemy_score)
                 show_game_over("enemy")
                 running = False
                 continue
@@ -622,13 +959,15 @@ def game_loop(mode):
             if pygame.sprite.spritecollide(enemy.head, snake.snake_sprites, False):
                 if mode == "play":
                     player_score += 1
-                    enemy.die()
-                else:
-                    enemy.die()
+                if enemy.is_alive:
+                    events.emit(tick, EventType.COLLISION, Actor.ENEMY, Cause.PLAYER, player_score, enemy_score)
+                    events.emit(tick, EventType.DEATH, Actor.ENEMY, Cause.PLAYER, player_score, enemy_score)
+                enemy.die()
 
             # Check food collisions
             if snake.check_collision_with_food(food):
                 player_score += 1
+                events.emit(tick, EventType.EAT, Actor.PLAYER, Cause.NONE, player_score, enemy_score)
                 food.spawn()
                 while (pygame.sprite.spritecollide(food, snake.snake_sprites, False) or
                        pygame.sprite.spritecollide(food, enemy.enemy_sprites, False) or
@@ -637,6 +976,7 @@ def game_loop(mode):
 
             if enemy.check_collision_with_food(food):
                 enemy_score += 1
+                events.emit(tick, EventType.EAT, Actor.ENEMY, Cause.NONE, player_score, enemy_score)
                 food.spawn()
                 while (pygame.sprite.spritecollide(food, snake.snake_sprites, False) or
                        pygame.sprite.spritecollide(food, enemy.enemy_sprites, False) or
@@ -670,4 +1010,7 @@ def main():
         game_loop(mode)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--compact" in sys.argv[1:]:
+        compact_logs()
+    else:
+        main()
\ No newline at end of file
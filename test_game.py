@@ -0,0 +1,210 @@
+import os
+import sys
+import types
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# game.py opens a window on import, so load it against a stub pygame and put the real one back after
+pygame_stub = mock.MagicMock()
+pygame_stub.sprite = types.SimpleNamespace(Sprite=object)
+with mock.patch.dict(sys.modules, {"pygame": pygame_stub}):
+    import game
+    from game import MatchLog, EventBus, EventType, Actor, Cause
+
+
+class MatchLogTest(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir)
+        self.columns_dir = os.path.join(self.log_dir, "columns")
+
+    def play(self, count, batch_size=4):
+        match_log = MatchLog(self.log_dir, batch_size)
+        self.emit_ticks(match_log, count)
+        match_log.close()
+        return match_log
+
+    def emit_ticks(self, match_log, count):
+        for tick in range(count):
+            match_log.record(tick, EventType.TICK, Actor.PLAYER, Cause.NONE, tick, 0)
+
+    def csv_rows(self, match_log):
+        if not os.path.exists(match_log.log_path):
+            return 0
+        with open(match_log.log_path) as f:
+            return sum(1 for _ in f)
+
+    def load_columns(self):
+        return game.load_columns(log_dir=self.log_dir)
+
+    def load_column(self, name):
+        return game.load_column(name, self.log_dir)
+
+    def pending_logs(self):
+        return [name for name in os.listdir(self.log_dir) if name != "columns"]
+
+    def test_bus_feeds_subscribers(self):
+        events = EventBus()
+        match_log = MatchLog(self.log_dir)
+        seen = []
+        events.subscribe(match_log.record)
+        events.subscribe(lambda *event: seen.append(event))
+        events.emit(7, EventType.EAT, Actor.ENEMY, Cause.NONE, 1, 2)
+
+        self.assertEqual(seen, [(7, EventType.EAT, Actor.ENEMY, Cause.NONE, 1, 2)])
+        self.assertEqual(match_log.buffer, [(match_log.match_id, 7, EventType.EAT.value,
+                                             Actor.ENEMY.value, Cause.NONE.value, 1, 2)])
+
+    def test_match_ids_fit_int64_and_differ(self):
+        ids = {MatchLog(self.log_dir).match_id for _ in range(100)}
+        self.assertEqual(len(ids), 100)
+        self.assertTrue(all(0 <= match_id < 2 ** 63 for match_id in ids))
+
+    def test_flushes_on_batch_boundary(self):
+        match_log = MatchLog(self.log_dir, batch_size=4)
+        self.emit_ticks(match_log, 3)
+        self.assertEqual(self.csv_rows(match_log), 0)
+        match_log.record(3, EventType.TICK, Actor.PLAYER, Cause.NONE, 0, 0)
+        self.assertEqual(self.csv_rows(match_log), 4)
+        self.assertEqual(match_log.buffer, [])
+
+    def test_compaction_round_trip(self):
+        match_log = MatchLog(self.log_dir, batch_size=4)
+        self.emit_ticks(match_log, 10)
+        match_log.record(10, EventType.DEATH, Actor.ENEMY, Cause.WALL, 3, 4)
+        match_log.close()
+
+        columns = self.load_columns()
+        self.assertEqual({len(column) for column in columns.values()}, {11})
+        self.assertEqual(list(columns["tick"]), list(range(11)))
+        self.assertEqual(columns["event"][-1], EventType.DEATH.value)
+        self.assertEqual(columns["cause"][-1], Cause.WALL.value)
+        self.assertEqual(list(columns["match"]), [match_log.match_id] * 11)
+        self.assertEqual(self.pending_logs(), [])
+
+    def test_load_column_reads_only_that_column(self):
+        self.play(3)
+        segment = game.read_manifest(self.columns_dir)[0]["name"]
+        os.remove(os.path.join(self.columns_dir, segment, "cause.bin"))
+
+        self.assertEqual(list(self.load_column("tick")), [0, 1, 2])
+
+    def test_torn_line_is_ended_before_appending(self):
+        first = MatchLog(self.log_dir, batch_size=2)
+        self.emit_ticks(first, 2)
+        with open(first.log_path, "a") as f:
+            f.write("17,3")  # Crash in the middle of a row
+
+        second = MatchLog(self.log_dir, batch_size=2)
+        second.log_path = first.log_path
+        self.emit_ticks(second, 2)
+        second.close()
+
+        columns = self.load_columns()
+        self.assertEqual(list(columns["tick"]), [0, 1, 0, 1])
+        self.assertEqual(list(columns["match"]), [first.match_id] * 2 + [second.match_id] * 2)
+
+    def test_disk_errors_do_not_stop_the_game(self):
+        blocker = os.path.join(self.log_dir, "not_a_dir")
+        open(blocker, "w").close()
+        match_log = MatchLog(os.path.join(blocker, "logs"), batch_size=2)
+
+        self.emit_ticks(match_log, 5)
+        match_log.close()
+        self.assertEqual(match_log.buffer, [])
+
+    def test_close_leaves_other_games_logs_alone(self):
+        stale = MatchLog(self.log_dir)
+        self.emit_ticks(stale, 2)
+        stale.flush()
+        os.utime(stale.log_path, (0, 0))
+
+        self.play(3)
+        self.assertEqual(len(self.load_column("tick")), 3)
+        self.assertEqual(self.pending_logs(), [os.path.basename(stale.log_path)])
+
+        game.compact_logs(self.log_dir)
+        self.assertEqual(len(self.load_column("tick")), 5)
+        self.assertEqual(self.pending_logs(), [])
+
+    def test_compact_logs_merges_small_segments(self):
+        for count in (3, 4, 5, 6):
+            self.play(count)
+        self.assertEqual(len(game.read_manifest(self.columns_dir)), 4)
+
+        game.compact_logs(self.log_dir, segment_rows=10)
+
+        manifest = game.read_manifest(self.columns_dir)
+        self.assertEqual(sorted(segment["rows"] for segment in manifest), [5, 6, 7])
+        self.assertEqual(sorted(os.listdir(self.columns_dir)),
+                         sorted(["manifest.json"] + [segment["name"] for segment in manifest]))
+        columns = self.load_columns()
+        self.assertEqual({len(column) for column in columns.values()}, {18})
+        self.assertEqual(sorted(columns["tick"]), sorted(t for count in (3, 4, 5, 6) for t in range(count)))
+
+    def test_recovers_from_interrupted_segment_write(self):
+        match_log = MatchLog(self.log_dir)
+        self.emit_ticks(match_log, 5)
+
+        # Die after the third column file of the segment is written
+        real_fsync = os.fsync
+        calls = []
+
+        def fsync(fd):
+            calls.append(fd)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            real_fsync(fd)
+
+        with mock.patch.object(game.os, "fsync", side_effect=fsync):
+            with self.assertRaises(KeyboardInterrupt):
+                match_log.close()
+
+        self.assertEqual(len(self.load_column("tick")), 0)
+        game.compact_logs(self.log_dir)
+        columns = self.load_columns()
+        self.assertEqual({len(column) for column in columns.values()}, {5})
+
+    def test_recovers_from_interrupted_log_removal(self):
+        match_log = MatchLog(self.log_dir)
+        self.emit_ticks(match_log, 3)
+
+        with mock.patch.object(game.os, "remove", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                match_log.close()
+
+        game.compact_logs(self.log_dir)
+        self.assertEqual(list(self.load_column("tick")), [0, 1, 2])
+        self.assertEqual(self.pending_logs(), [])
+
+    def test_recovers_from_interrupted_merge(self):
+        self.play(2)
+        self.play(3)
+
+        # Die after the merged segment is written but before the manifest points at it
+        with mock.patch.object(game, "write_manifest", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                game.compact_logs(self.log_dir)
+        self.assertEqual(len(self.load_column("tick")), 5)
+
+        with mock.patch.object(game, "LOG_STALE_SECONDS", -1):
+            game.compact_logs(self.log_dir)
+        manifest = game.read_manifest(self.columns_dir)
+        self.assertEqual([segment["rows"] for segment in manifest], [5])
+        self.assertEqual(sorted(os.listdir(self.columns_dir)), sorted(["manifest.json", manifest[0]["name"]]))
+        self.assertEqual(len(self.load_column("tick")), 5)
+
+    def test_mismatched_column_lengths_are_rejected(self):
+        self.play(3)
+
+        segment = game.read_manifest(self.columns_dir)[0]["name"]
+        with open(os.path.join(self.columns_dir, segment, "tick.bin"), "ab") as f:
+            f.write(b"\0" * 8)
+        with self.assertRaises(ValueError):
+            self.load_columns()
+
+
+if __name__ == "__main__":
+    unittest.main()